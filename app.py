@@ -3,34 +3,123 @@ Star Citizen Cargo Route Optimizer - Main Flask Application
 """
 import os
 import json
-from flask import Flask, request, jsonify, send_from_directory, render_template
+import hashlib
+import logging
+import types
+import orjson
+from flask import Flask, Response, request, jsonify, render_template, url_for
+from flask.json.provider import JSONProvider
+from flask_compress import Compress
 from flask_cors import CORS
 
-from data_fetcher import download_and_process_map_data
-from route_optimizer import calculate_route, DEFAULT_SHIP_CAPACITY
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+from data_fetcher import download_and_process_map_data, map_data_is_current
+from route_optimizer import calculate_route, preload_location_data, DEFAULT_SHIP_CAPACITY
+
+
+class ORJSONProvider(JSONProvider):
+    """Flask JSON provider backed by orjson for request parsing and jsonify responses."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
+app.json = ORJSONProvider(app)
 CORS(app)  # Enable CORS for all routes
 
+# Let browsers cache static assets for a day; the URLs are versioned (see static_url)
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 86400
+# Behind a server that supports X-Sendfile, hand static file transfers off to it
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE') == '1'
+
+# Compress JSON and static text responses, preferring Brotli where the browser supports it
+app.config['COMPRESS_MIN_SIZE'] = 500
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+if app.config['USE_X_SENDFILE']:
+    # Static responses are then empty bodies for the front-end to fill in, which must not be
+    # compressed (or labelled as compressed), so only compress the API's JSON
+    app.config['COMPRESS_MIMETYPES'] = ['application/json']
+Compress(app)
+
+# Ships available in the planner and their cargo capacities in SCU
+SHIPS = [
+    {"id": "taurus", "name": "Constellation Taurus", "cargo_capacity": 168},
+    {"id": "freelancer", "name": "Freelancer", "cargo_capacity": 66},
+    {"id": "caterpillar", "name": "Caterpillar", "cargo_capacity": 576},
+    {"id": "cutlass_black", "name": "Cutlass Black", "cargo_capacity": 46},
+    {"id": "c2_hercules", "name": "C2 Hercules", "cargo_capacity": 696},
+]
+SHIP_CAPACITIES = types.MappingProxyType({ship["id"]: ship["cargo_capacity"] for ship in SHIPS})
+
+# Fields every mission in an optimize request must provide
+REQUIRED_MISSION_FIELDS = frozenset(('pickup', 'cargo_scu'))
+# A mission needs either the new multi-dropoff field or the old single dropoff field
+DROPOFF_FIELDS = frozenset(('dropoffs', 'dropoff'))
+
+
 # Ensure data directory exists and contains the required files
 def initialize_data():
-    """Initialize data files if they don't exist."""
+    """Initialize data files if they don't exist or are out of date."""
     if not os.path.exists('data'):
         print("Creating data directory...")
         os.makedirs('data', exist_ok=True)
 
-    # Check if location data files exist
-    if not (os.path.exists('data/simplified_locations.json') and
-            os.path.exists('data/locations.json') and
-            os.path.exists('data/distance_matrix.json')):
-        print("Initializing location data...")
-        download_and_process_map_data()
-    else:
+    # Check if location data files exist and match the current location table
+    if map_data_is_current():
         print("Location data already exists.")
+        return
+
+    # Only one worker process should regenerate the files at a time
+    with open('data/.lock', 'w') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        # Another worker may have finished regenerating while we waited for the lock
+        if map_data_is_current():
+            print("Location data already exists.")
+        else:
+            print("Initializing location data...")
+            download_and_process_map_data()
+
+def load_locations_json():
+    """Read the simplified locations file as a ready-to-send response body and its ETag."""
+    with open('data/simplified_locations.json', 'rb') as f:
+        body = f.read()
+
+    if app.logger.isEnabledFor(logging.DEBUG):
+        app.logger.debug("Serving %d locations to client", len(json.loads(body)['names']))
+
+    return body, hashlib.md5(body).hexdigest()
+
 
 # Initialize data at startup
 initialize_data()
 
+# Load the distance matrix and location list once so requests don't re-read them from disk.
+# Under gunicorn --preload this happens in the master and workers inherit the results.
+preload_location_data()
+
+# The location list is static, so it is serialized once instead of per request
+locations_json = load_locations_json()
+
+
+@app.context_processor
+def static_file_helpers():
+    """Provide static_url() to templates."""
+    def static_url(filename):
+        """URL for a static file, versioned by its modification time so cached copies refresh after changes."""
+        mtime = int(os.path.getmtime(os.path.join(app.static_folder, filename)))
+        return url_for('static', filename=filename, v=mtime)
+    return {'static_url': static_url}
+
 
 @app.route('/')
 def index():
@@ -41,44 +130,49 @@ def index():
 @app.route('/api/locations')
 def get_locations():
     """Get the list of available locations."""
-    try:
-        with open('data/simplified_locations.json', 'r') as f:
-            locations = json.load(f)
-            
-        # Add debug info
-        print(f"DEBUG: Serving {len(locations)} locations to client")
-        # Check for specific locations
-        location_names = [loc['name'] for loc in locations]
-        print("DEBUG: Riker Memorial Spaceport in API response:", "Riker Memorial Spaceport" in location_names)
-        print("DEBUG: Samson & Son's Salvage Center in API response:", "Samson & Son's Salvage Center" in location_names)
-        print("DEBUG: CRU-L4 Shallow Fields Station in API response:", "CRU-L4 Shallow Fields Station" in location_names)
-            
-        return jsonify(locations)
-    except FileNotFoundError:
-        # If the file doesn't exist, regenerate the data
-        print("Location data not found. Regenerating...")
-        try:
-            data = download_and_process_map_data()
-            return jsonify(data['simplified'])
-        except Exception as e:
-            print(f"Error generating location data: {e}")
-            return jsonify({"error": f"Failed to generate location data: {str(e)}"}), 500
-    except Exception as e:
-        print(f"Error loading location data: {e}")
-        return jsonify({"error": f"Error loading location data: {str(e)}"}), 500
+    body, etag = locations_json
+
+    # Let the browser revalidate with If-None-Match and get a 304 when unchanged.
+    # flask-compress appends the encoding to the ETag ("<hash>:br"), so match on the hash part.
+    client_etags = request.if_none_match.as_set(include_weak=True)
+    if any(tag.split(':', 1)[0] == etag for tag in client_etags):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
 
 
 @app.route('/api/ships')
 def get_ships():
     """Get the list of available ships with cargo capacities."""
-    ships = [
-        {"id": "taurus", "name": "Constellation Taurus", "cargo_capacity": 168},
-        {"id": "freelancer", "name": "Freelancer", "cargo_capacity": 66},
-        {"id": "caterpillar", "name": "Caterpillar", "cargo_capacity": 576},
-        {"id": "cutlass_black", "name": "Cutlass Black", "cargo_capacity": 46},
-        {"id": "c2_hercules", "name": "C2 Hercules", "cargo_capacity": 696},
-    ]
-    return jsonify(ships)
+    return jsonify(SHIPS)
+
+
+def validate_mission(mission):
+    """Check the format of a single mission, returning an error message or None if it is valid."""
+    if not isinstance(mission, dict):
+        return "Invalid mission format: missing pickup or cargo_scu"
+
+    fields = mission.keys()
+    if not fields >= REQUIRED_MISSION_FIELDS:
+        return "Invalid mission format: missing pickup or cargo_scu"
+
+    # Check for dropoffs (new format) or dropoff (old format)
+    if fields.isdisjoint(DROPOFF_FIELDS):
+        return "Invalid mission format: missing dropoff location(s)"
+
+    if 'dropoffs' in fields:
+        dropoffs = mission['dropoffs']
+        # Ensure dropoffs is a list
+        if not isinstance(dropoffs, list):
+            return "Invalid mission format: dropoffs must be a list"
+        # Ensure there's at least one dropoff
+        if not dropoffs:
+            return "Invalid mission format: at least one dropoff location is required"
+
+    return None
 
 
 @app.route('/api/optimize', methods=['POST'])
@@ -97,16 +191,7 @@ def optimize_route():
         print(f"Received optimize request: {json.dumps(data)}")
         
         # Set ship capacity based on selected ship (default to Taurus)
-        ship_capacity = DEFAULT_SHIP_CAPACITY
-        if ship_id != 'taurus':
-            # In a real app, get this from a database or config
-            ships = {
-                "freelancer": 66,
-                "caterpillar": 576,
-                "cutlass_black": 46,
-                "c2_hercules": 696,
-            }
-            ship_capacity = ships.get(ship_id, DEFAULT_SHIP_CAPACITY)
+        ship_capacity = SHIP_CAPACITIES.get(ship_id, DEFAULT_SHIP_CAPACITY)
         
         if not missions:
             return jsonify({"error": "No missions provided"}), 400
@@ -117,22 +202,12 @@ def optimize_route():
         
         # Validate missions
         for mission in missions:
-            if 'pickup' not in mission or 'cargo_scu' not in mission:
-                return jsonify({"error": "Invalid mission format: missing pickup or cargo_scu"}), 400
-                
-            # Check for dropoffs (new format) or dropoff (old format)
-            if 'dropoffs' not in mission and 'dropoff' not in mission:
-                return jsonify({"error": "Invalid mission format: missing dropoff location(s)"}), 400
-                
-            # Ensure dropoffs is a list
-            if 'dropoffs' in mission and not isinstance(mission['dropoffs'], list):
-                return jsonify({"error": "Invalid mission format: dropoffs must be a list"}), 400
-                
-            # Ensure there's at least one dropoff
-            if 'dropoffs' in mission and len(mission['dropoffs']) == 0:
-                return jsonify({"error": "Invalid mission format: at least one dropoff location is required"}), 400
+            error = validate_mission(mission)
+            if error:
+                return jsonify({"error": error}), 400
         
-        result = calculate_route(missions, start_location, ship_capacity)
+        # The frontend shows the cargo types carried at each step
+        result = calculate_route(missions, start_location, ship_capacity, include_cargo_types=True)
         return jsonify(result)
     except Exception as e:
         import traceback
@@ -141,11 +216,5 @@ def optimize_route():
         return jsonify({"error": str(e)}), 500
 
 
-@app.route('/static/<path:path>')
-def serve_static(path):
-    """Serve static files."""
-    return send_from_directory('static', path)
-
-
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
@@ -2,11 +2,20 @@
 Star Citizen location data fetcher and processor.
 This script downloads and processes Star Citizen locations for the Stanton system.
 """
+import hashlib
+import io
 import json
+import logging
 import os
+from functools import lru_cache
+from pathlib import Path
+import numpy as np
+import orjson
 import requests
 import pandas as pd
 
+logger = logging.getLogger(__name__)
+
 # Define the Stanton system locations (coordinates are approximate/fictional)
 # In a real implementation, we would try to fetch this from Star Citizen API or sources
 STANTON_LOCATIONS = {
@@ -130,130 +139,212 @@ STANTON_LOCATIONS = {
     "MIC-L5 Steel Hollow Station": {"type": "station", "x": 26000000, "y": 0, "z": 41000000},
 }
 
-def download_and_process_map_data():
+# Column views of STANTON_LOCATIONS (same order), so the numeric processing works on
+# contiguous arrays instead of walking the per-location dicts
+LOCATION_NAMES = list(STANTON_LOCATIONS)
+LOCATION_TYPES = [loc['type'] for loc in STANTON_LOCATIONS.values()]
+LOCATION_PARENTS = [loc.get('parent') for loc in STANTON_LOCATIONS.values()]
+LOCATION_COORDS = np.array([(loc['x'], loc['y'], loc['z']) for loc in STANTON_LOCATIONS.values()], dtype=np.int64)
+LOCATION_COORDS.flags.writeable = False
+
+# Fingerprint of the location table, stored next to the generated files so they
+# are only rebuilt when STANTON_LOCATIONS changes
+STANTON_HASH = hashlib.sha1(json.dumps(STANTON_LOCATIONS, sort_keys=True).encode()).hexdigest()
+STAMP_FILE = Path('data/.stamp')
+DATA_FILES = (
+    Path('data/simplified_locations.json'),
+    Path('data/locations.json'),
+    Path('data/distance_matrix.npy'),
+    Path('data/distance_index.json'),
+)
+
+
+def map_data_is_current():
+    """Check that all generated data files exist and were built from the current STANTON_LOCATIONS."""
+    if not all(path.is_file() for path in DATA_FILES):
+        return False
+    try:
+        return STAMP_FILE.read_text().strip() == STANTON_HASH
+    except FileNotFoundError:
+        return False
+
+
+# Recently added locations that are checked for in the debug log when the data is built
+DEBUG_CHECK_LOCATIONS = (
+    "Riker Memorial Spaceport",
+    "Samson & Son's Salvage Center",
+    "CRU-L4 Shallow Fields Station",
+)
+
+
+def _log_location_check(stage, names):
+    """Log how many locations made it through a processing stage and whether the checked ones are present."""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    names = list(names)
+    logger.debug("%s locations count: %d", stage, len(names))
+    for name in DEBUG_CHECK_LOCATIONS:
+        logger.debug("%s in %s: %s", name, stage.lower(), name in names)
+
+
+def _write_atomic(path, data):
+    """
+    Write bytes to a file by writing a temporary file and renaming it into place,
+    so readers in other processes never see a partially written file.
+    """
+    path = Path(path)
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    tmp_path.write_bytes(data)
+    tmp_path.replace(path)
+
+
+def _build_distance_matrix(coords):
+    """
+    Build the full pairwise distance matrix from an (N, 3) array of x, y, z coordinates.
+    Euclidean distance in 3D space, computed for all pairs at once with NumPy.
+    Distances are symmetric, so only the upper triangle is computed and then mirrored.
+
+    Coordinates are integers, so the squared differences are summed exactly in int64
+    (they stay below 2**63 for the whole Stanton system). Routing only needs float32
+    precision, which halves the size of the matrix.
+    """
+    location_count = len(coords)
+    i, j = np.triu_indices(location_count, k=1)
+    deltas = coords[i] - coords[j]
+    pair_distances = np.sqrt((deltas * deltas).sum(axis=1))
+
+    distances = np.zeros((location_count, location_count), dtype=np.float32)
+    distances[i, j] = pair_distances
+    distances[j, i] = pair_distances
+    return distances
+
+
+def load_map_data():
+    """Load previously generated map data files in the same shape download_and_process_map_data returns."""
+    simplified = orjson.loads(Path('data/simplified_locations.json').read_bytes())
+    locations = orjson.loads(Path('data/locations.json').read_bytes())
+    distance_index = orjson.loads(Path('data/distance_index.json').read_bytes())
+    
+    return {
+        'locations': locations,
+        'simplified': simplified,
+        'distances': {
+            'locations': distance_index['locations'],
+            'index': distance_index['index'],
+            'matrix': np.load('data/distance_matrix.npy')
+        }
+    }
+
+
+@lru_cache(maxsize=1)
+def compute_map_data():
+    """
+    Build the location lists and distance matrix from STANTON_LOCATIONS without touching disk.
+    STANTON_LOCATIONS is static, so the result is computed once per process; treat it as read-only.
+    """
+    # For now, we'll use our predefined data
+    # In a real implementation, we'd make API requests for updated data
+    
+    _log_location_check("Defined", STANTON_LOCATIONS)
+    
+    # Calculate distances between locations
+    locations = [
+        {'name': name, 'type': location_type, 'parent': parent, 'x': x, 'y': y, 'z': z}
+        for name, location_type, parent, (x, y, z)
+        in zip(LOCATION_NAMES, LOCATION_TYPES, LOCATION_PARENTS, LOCATION_COORDS.tolist())
+    ]
+    
+    _log_location_check("Processed", (loc['name'] for loc in locations))
+    
+    # Create a simplified version for the frontend, as parallel columns so each key is sent once
+    # Simplified to 2D (x, z) coordinates in millions of km. Three decimals (1000 km) is
+    # finer than the map can show and keeps every location at a distinct position.
+    map_coordinates = np.round(LOCATION_COORDS[:, [0, 2]] / 1000000, 3)
+    simplified_locations = {
+        'names': list(LOCATION_NAMES),
+        'types': list(LOCATION_TYPES),
+        'x': map_coordinates[:, 0].tolist(),
+        'z': map_coordinates[:, 1].tolist()
+    }
+    
+    _log_location_check("Simplified", simplified_locations['names'])
+    
+    # Calculate a distance matrix for routing
+    distances = _build_distance_matrix(LOCATION_COORDS)
+    distances.flags.writeable = False
+
+    # Map each location name to its row/column in the matrix so lookups don't scan the list
+    location_names = list(LOCATION_NAMES)
+    name_to_index = {name: i for i, name in enumerate(location_names)}
+    
+    return {
+        'locations': locations,
+        'simplified': simplified_locations,
+        'distances': {
+            'locations': location_names,
+            'index': name_to_index,
+            'matrix': distances
+        }
+    }
+
+
+def write_map_data(data):
+    """Write map data from compute_map_data() to the data directory, followed by the stamp file."""
+    # Create data directory if it doesn't exist
+    if not os.path.exists('data'):
+        os.makedirs('data')
+    
+    # Save the location data
+    _write_atomic('data/locations.json', orjson.dumps(data['locations']))
+    
+    print(f"Saved {len(data['locations'])} locations to data/locations.json")
+    
+    # Save the simplified locations data file
+    _write_atomic('data/simplified_locations.json', orjson.dumps(data['simplified']))
+    
+    print(f"Saved {len(data['simplified']['names'])} simplified locations to data/simplified_locations.json")
+
+    # Save the distance matrix as a binary .npy file (4 bytes per distance, memory-mappable)
+    # and the location names/indices it is ordered by alongside it
+    distances = data['distances']
+    matrix_file = io.BytesIO()
+    np.save(matrix_file, distances['matrix'])
+    _write_atomic('data/distance_matrix.npy', matrix_file.getvalue())
+    _write_atomic('data/distance_index.json', orjson.dumps({
+        'locations': distances['locations'],
+        'index': distances['index']
+    }))
+    
+    print("Generated distance matrix for routing calculations")
+
+    # Record which version of the location table these files were built from.
+    # Written last, so an interrupted run is regenerated on the next start.
+    _write_atomic(STAMP_FILE, STANTON_HASH.encode())
+
+
+def download_and_process_map_data(force=False):
     """
     Either download map data from an external source or use the predefined data.
     In a real implementation, we would try to fetch this from official sources.
+
+    If the data files were already built from the current STANTON_LOCATIONS they are
+    loaded instead of regenerated, unless force is set.
     """
+    if not force and map_data_is_current():
+        return load_map_data()
+
     try:
-        # Create data directory if it doesn't exist
-        if not os.path.exists('data'):
-            os.makedirs('data')
-        
-        # For now, we'll use our predefined data
-        # In a real implementation, we'd make API requests for updated data
-        
-        # Debug print to check all locations
-        print("DEBUG: Total locations defined:", len(STANTON_LOCATIONS))
-        print("DEBUG: Checking for specific locations:")
-        print("DEBUG: Riker Memorial Spaceport in locations:", "Riker Memorial Spaceport" in STANTON_LOCATIONS)
-        print("DEBUG: Samson & Son's Salvage Center in locations:", "Samson & Son's Salvage Center" in STANTON_LOCATIONS)
-        print("DEBUG: CRU-L4 Shallow Fields Station in locations:", "CRU-L4 Shallow Fields Station" in STANTON_LOCATIONS)
-        
-        # Calculate distances between locations
-        locations = []
-        for location_name, location_data in STANTON_LOCATIONS.items():
-            locations.append({
-                'name': location_name,
-                'type': location_data['type'],
-                'parent': location_data.get('parent', None),
-                'x': location_data['x'],
-                'y': location_data['y'],
-                'z': location_data['z']
-            })
-        
-        # Debug print to check which locations were processed
-        processed_names = [loc['name'] for loc in locations]
-        print("DEBUG: Processed locations count:", len(processed_names))
-        print("DEBUG: Riker Memorial Spaceport in processed:", "Riker Memorial Spaceport" in processed_names)
-        print("DEBUG: Samson & Son's Salvage Center in processed:", "Samson & Son's Salvage Center" in processed_names)
-        print("DEBUG: CRU-L4 Shallow Fields Station in processed:", "CRU-L4 Shallow Fields Station" in processed_names)
-        
-        # Save the location data
-        with open('data/locations.json', 'w') as f:
-            json.dump(locations, f, indent=2)
-        
-        print(f"Saved {len(locations)} locations to data/locations.json")
-        
-        # Create a simplified version for the frontend
-        simplified_locations = []
-        for loc in locations:
-            simplified_locations.append({
-                'name': loc['name'],
-                'type': loc['type'],
-                'coordinates': [loc['x']/1000000, loc['z']/1000000]  # Simplified to 2D coordinates in millions of km
-            })
-        
-        # Debug print to check simplified locations
-        simplified_names = [loc['name'] for loc in simplified_locations]
-        print("DEBUG: Simplified locations count:", len(simplified_names))
-        print("DEBUG: Riker Memorial Spaceport in simplified:", "Riker Memorial Spaceport" in simplified_names)
-        print("DEBUG: Samson & Son's Salvage Center in simplified:", "Samson & Son's Salvage Center" in simplified_names)
-        print("DEBUG: CRU-L4 Shallow Fields Station in simplified:", "CRU-L4 Shallow Fields Station" in simplified_names)
-        
-        # Save the simplified locations data file
-        with open('data/simplified_locations.json', 'w') as f:
-            json.dump(simplified_locations, f, indent=2)
-        
-        print(f"Saved {len(simplified_locations)} simplified locations to data/simplified_locations.json")
-        
-        # Calculate a distance matrix for routing
-        location_count = len(locations)
-        distances = [[0 for _ in range(location_count)] for _ in range(location_count)]
-        
-        for i in range(location_count):
-            for j in range(location_count):
-                if i != j:
-                    # Euclidean distance in 3D space
-                    dist = ((locations[i]['x'] - locations[j]['x'])**2 + 
-                            (locations[i]['y'] - locations[j]['y'])**2 + 
-                            (locations[i]['z'] - locations[j]['z'])**2)**0.5
-                    distances[i][j] = dist
-        
-        # Save the distance matrix data file
-        with open('data/distance_matrix.json', 'w') as f:
-            json.dump({
-                'locations': [loc['name'] for loc in locations],
-                'distances': distances
-            }, f, indent=2)
-        
-        print("Generated distance matrix for routing calculations")
-        
-        return {
-            'locations': locations,
-            'simplified': simplified_locations,
-            'distances': {
-                'locations': [loc['name'] for loc in locations],
-                'matrix': distances
-            }
-        }
+        data = compute_map_data()
+        write_map_data(data)
+        return data
     except Exception as e:
         print(f"Error in download_and_process_map_data: {e}")
         # Still try to return any data that might exist
         try:
-            # Try to load existing simplified_locations.json
-            with open('data/simplified_locations.json', 'r') as f:
-                simplified = json.load(f)
-            
-            # Try to load existing locations.json
-            with open('data/locations.json', 'r') as f:
-                locations = json.load(f)
-            
-            # Try to load existing distance_matrix.json
-            with open('data/distance_matrix.json', 'r') as f:
-                distance_data = json.load(f)
-            
-            return {
-                'locations': locations,
-                'simplified': simplified,
-                'distances': {
-                    'locations': distance_data['locations'],
-                    'matrix': distance_data['distances']
-                }
-            }
+            return load_map_data()
         except Exception as inner_e:
             print(f"Failed to load existing data: {inner_e}")
             raise e
 
 if __name__ == "__main__":
-    download_and_process_map_data() 
\ No newline at end of file
+    download_and_process_map_data(force=True) 
\ No newline at end of file
@@ -0,0 +1,20 @@
+"""
+Gunicorn configuration for running the Cargo Route Optimizer in production.
+
+Start the server from the project directory with:
+
+    gunicorn app:app
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+
+# Route solving is CPU bound and the location/static endpoints are I/O bound,
+# so use a process per core plus a few threads per process
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = 4
+
+# Load the app (and its location data) once in the master; workers share it copy-on-write
+preload_app = True
@@ -1,17 +1,62 @@
 """
 Route optimization for Star Citizen cargo missions.
 """
+import copy
 import json
-import networkx as nx
+import math
+from functools import lru_cache
+from pathlib import Path
 import numpy as np
+import orjson
 from typing import List, Dict, Tuple, Any
 
 # Constants
 DEFAULT_SHIP_CAPACITY = 168  # Constellation Taurus cargo capacity in SCU
 
+# Kinds of stop in a route
+ACTION_PICKUP = 0
+ACTION_DROPOFF = 1
+
+# Missions are routed exactly when they have at most this many combinations of progress
+# (e.g. 6 single-dropoff missions have 3**6 = 729); larger sets use greedy + 2-opt
+EXACT_SEARCH_MAX_STATES = 1000
+
+
+@lru_cache(maxsize=1)
+def _load_location_files() -> Tuple[List[Dict[str, Any]], List[str], Dict[str, int], np.ndarray]:
+    """
+    Load locations, the distance matrix and its location names and indices from the data files.
+
+    The loaded data is cached for the lifetime of the process so that each
+    route calculation does not re-read the files. The matrix is memory-mapped,
+    so worker processes share the same pages instead of each holding a copy.
+    Raises FileNotFoundError if the data files have not been generated yet.
+    """
+    locations = orjson.loads(Path('data/locations.json').read_bytes())
+    distance_index = orjson.loads(Path('data/distance_index.json').read_bytes())
+    location_names, location_indices = distance_index['locations'], distance_index['index']
+
+    # A plain ndarray view of the memory map: same shared pages, without np.memmap's per-index overhead
+    distance_matrix = np.asarray(np.load('data/distance_matrix.npy', mmap_mode='r'))
+
+    print(f"Loaded {len(locations)} locations with distance matrix")
+    return locations, location_names, location_indices, distance_matrix
+
+
+def preload_location_data():
+    """
+    Load the location data and distance matrix ahead of the first route calculation.
+    Raises FileNotFoundError if the data files have not been generated yet.
+    """
+    _load_location_files()
+
+
 class CargoMission:
     """Represents a cargo mission with pickup, dropoff(s), cargo amount and cargo type."""
     
+    __slots__ = ('mission_id', 'pickup', 'dropoffs', 'cargo_scu', 'cargo_type', 'dropoff_cargo_types',
+                 'dropoff_cargo_amounts', 'payout', 'description', 'completed', 'current_dropoff_index')
+    
     def __init__(self, mission_id: str, pickup: str, dropoffs: List[str], cargo_scu: float, 
                  cargo_type: str = "General", dropoff_cargo_types: List[str] = None,
                  dropoff_cargo_amounts: List[float] = None, payout: float = 0.0, description: str = ""):
@@ -22,34 +67,46 @@ class CargoMission:
         self.cargo_scu = cargo_scu
         self.cargo_type = cargo_type  # Default cargo type
         
-        # Handle cargo types for each dropoff
-        if dropoff_cargo_types is None:
-            # If not specified, use the same cargo type for all dropoffs
-            self.dropoff_cargo_types = [cargo_type] * len(self.dropoffs)
+        if len(self.dropoffs) == 1:
+            # Single dropoff (the common case): it takes the first given cargo type or the
+            # mission's, and the first given amount or all of the mission's cargo
+            self.dropoff_cargo_types = dropoff_cargo_types[:1] if dropoff_cargo_types else [cargo_type]
+            if dropoff_cargo_amounts:
+                self.dropoff_cargo_amounts = dropoff_cargo_amounts[:1]
+            elif dropoff_cargo_amounts is None:
+                self.dropoff_cargo_amounts = [float(self.cargo_scu)]
+            else:
+                # An empty list of amounts gets the remaining (non-negative) cargo
+                self.dropoff_cargo_amounts = [float(max(0, self.cargo_scu))]
         else:
-            # Make sure we have the right number of cargo types
-            if len(dropoff_cargo_types) < len(self.dropoffs):
-                # Fill in missing types with the default
-                self.dropoff_cargo_types = dropoff_cargo_types + [cargo_type] * (len(self.dropoffs) - len(dropoff_cargo_types))
+            # Handle cargo types for each dropoff
+            if dropoff_cargo_types is None:
+                # If not specified, use the same cargo type for all dropoffs
+                self.dropoff_cargo_types = [cargo_type] * len(self.dropoffs)
             else:
-                self.dropoff_cargo_types = dropoff_cargo_types[:len(self.dropoffs)]
+                # Make sure we have the right number of cargo types
+                if len(dropoff_cargo_types) < len(self.dropoffs):
+                    # Fill in missing types with the default
+                    self.dropoff_cargo_types = dropoff_cargo_types + [cargo_type] * (len(self.dropoffs) - len(dropoff_cargo_types))
+                else:
+                    self.dropoff_cargo_types = dropoff_cargo_types[:len(self.dropoffs)]
         
-        # Handle cargo amounts for each dropoff
-        if dropoff_cargo_amounts is None:
-            # If not specified, distribute cargo evenly among dropoffs
-            amount_per_dropoff = self.cargo_scu / len(self.dropoffs)
-            self.dropoff_cargo_amounts = [amount_per_dropoff] * len(self.dropoffs)
-        else:
-            # Make sure we have the right number of amounts
-            if len(dropoff_cargo_amounts) < len(self.dropoffs):
-                # Distribute remaining cargo evenly among remaining dropoffs
-                total_specified = sum(dropoff_cargo_amounts)
-                remaining = max(0, self.cargo_scu - total_specified)
-                remaining_dropoffs = len(self.dropoffs) - len(dropoff_cargo_amounts)
-                amount_per_remaining = remaining / remaining_dropoffs if remaining_dropoffs > 0 else 0
-                self.dropoff_cargo_amounts = dropoff_cargo_amounts + [amount_per_remaining] * remaining_dropoffs
+            # Handle cargo amounts for each dropoff
+            if dropoff_cargo_amounts is None:
+                # If not specified, distribute cargo evenly among dropoffs
+                amount_per_dropoff = self.cargo_scu / len(self.dropoffs)
+                self.dropoff_cargo_amounts = [amount_per_dropoff] * len(self.dropoffs)
             else:
-                self.dropoff_cargo_amounts = dropoff_cargo_amounts[:len(self.dropoffs)]
+                # Make sure we have the right number of amounts
+                if len(dropoff_cargo_amounts) < len(self.dropoffs):
+                    # Distribute remaining cargo evenly among remaining dropoffs
+                    total_specified = sum(dropoff_cargo_amounts)
+                    remaining = max(0, self.cargo_scu - total_specified)
+                    remaining_dropoffs = len(self.dropoffs) - len(dropoff_cargo_amounts)
+                    amount_per_remaining = remaining / remaining_dropoffs if remaining_dropoffs > 0 else 0
+                    self.dropoff_cargo_amounts = dropoff_cargo_amounts + [amount_per_remaining] * remaining_dropoffs
+                else:
+                    self.dropoff_cargo_amounts = dropoff_cargo_amounts[:len(self.dropoffs)]
                 
         self.payout = payout  # Mission payout in aUEC
         self.description = description
@@ -95,6 +152,60 @@ class CargoMission:
         return f"Mission({self.mission_id}: {self.pickup} → [{dropoff_str}], {self.cargo_scu} SCU total, {self.payout} aUEC)"
 
 
+def _cargo_types_at_steps(missions, arrays, events) -> List[Dict[str, float]]:
+    """
+    Work out the cargo carried per type after each stop of a route, starting from an empty hold.
+    The running totals are updated in place and copied once per step.
+    """
+    cargo_types = {}
+    cargo_types_at_steps = [{}]
+    for action, m, dropoff_number in events:
+        mission = missions[m]
+        if action == ACTION_PICKUP:
+            cargo_type = mission.cargo_type
+            cargo_types[cargo_type] = cargo_types.get(cargo_type, 0) + float(arrays.cargo_scu[m])
+        else:
+            cargo_type = mission.dropoff_cargo_types[dropoff_number]
+            if cargo_type in cargo_types:
+                amount = float(arrays.dropoff_amount[arrays.dropoff_start[m] + dropoff_number])
+                cargo_types[cargo_type] = max(0, cargo_types[cargo_type] - amount)
+                if cargo_types[cargo_type] == 0:
+                    del cargo_types[cargo_type]
+        cargo_types_at_steps.append(cargo_types.copy())
+    return cargo_types_at_steps
+
+
+def _describe_stop(mission: CargoMission, action: int, dropoff_number: int) -> str:
+    """The mission_order text for a stop, e.g. "Pickup 1 - Titanium" or "Dropoff 1 at Lorville - Titanium"."""
+    if action == ACTION_PICKUP:
+        return f"Pickup {mission.mission_id} - {mission.cargo_type}"
+    return f"Dropoff {mission.mission_id} at {mission.dropoffs[dropoff_number]} - {mission.dropoff_cargo_types[dropoff_number]}"
+
+
+class _MissionArrays:
+    """
+    Struct-of-arrays view of a list of missions for the optimizer's inner loop.
+    
+    Locations are resolved to distance matrix indices once, and each mission's dropoffs
+    are stored back to back in flat arrays: mission m's dropoffs are at positions
+    dropoff_start[m] to dropoff_start[m] + dropoff_count[m] - 1. next_dropoff[m] is how
+    many of them have been completed, and is advanced by the optimizer.
+    """
+    
+    def __init__(self, missions: List[CargoMission], location_indices: Dict[str, int]):
+        self.pickup_idx = np.array([location_indices[m.pickup] for m in missions], dtype=np.intp)
+        self.cargo_scu = np.array([m.cargo_scu for m in missions], dtype=np.float64)
+        # Payout per distance, filled in by the optimizer once the distances are known
+        self.efficiency = np.zeros(len(missions), dtype=np.float64)
+        
+        self.dropoff_count = np.array([len(m.dropoffs) for m in missions], dtype=np.intp)
+        self.dropoff_start = np.zeros(len(missions), dtype=np.intp)
+        np.cumsum(self.dropoff_count[:-1], out=self.dropoff_start[1:])
+        self.dropoff_idx = np.array([location_indices[d] for m in missions for d in m.dropoffs], dtype=np.intp)
+        self.dropoff_amount = np.array([a for m in missions for a in m.dropoff_cargo_amounts], dtype=np.float64)
+        self.next_dropoff = np.zeros(len(missions), dtype=np.intp)
+
+
 class RouteOptimizer:
     """Optimizes routes for cargo missions."""
     
@@ -102,21 +213,14 @@ class RouteOptimizer:
         self.ship_capacity = ship_capacity
         self.locations = []
         self.distance_matrix = None
+        self.location_names = []
         self.location_indices = {}
         self.load_location_data()
     
     def load_location_data(self):
-        """Load location data from saved files."""
+        """Load location data from saved files (cached per process)."""
         try:
-            with open('data/locations.json', 'r') as f:
-                self.locations = json.load(f)
-            
-            with open('data/distance_matrix.json', 'r') as f:
-                distance_data = json.load(f)
-                self.location_indices = {loc: i for i, loc in enumerate(distance_data['locations'])}
-                self.distance_matrix = distance_data['distances']
-            
-            print(f"Loaded {len(self.locations)} locations with distance matrix")
+            self.locations, self.location_names, self.location_indices, self.distance_matrix = _load_location_files()
         except FileNotFoundError:
             print("Location data not found. Run data_fetcher.py first.")
     
@@ -125,20 +229,21 @@ class RouteOptimizer:
         if location_a == location_b:
             return 0
         
-        try:
-            idx_a = self.location_indices.get(location_a)
-            idx_b = self.location_indices.get(location_b)
-            
-            if idx_a is None or idx_b is None:
-                print(f"Warning: Location not found in distance matrix: {location_a} or {location_b}")
-                return float('inf')
-            
-            return self.distance_matrix[idx_a][idx_b]
-        except (KeyError, IndexError, TypeError) as e:
-            print(f"Error calculating distance between {location_a} and {location_b}: {e}")
+        idx_a = self.location_indices.get(location_a)
+        idx_b = self.location_indices.get(location_b)
+        
+        if idx_a is None or idx_b is None:
+            print(f"Warning: Location not found in distance matrix: {location_a} or {location_b}")
             return float('inf')
+        
+        return self._dist_by_idx(idx_a, idx_b)
     
-    def optimize_route(self, missions: List[CargoMission], start_location: str) -> Dict[str, Any]:
+    def _dist_by_idx(self, idx_a: int, idx_b: int) -> float:
+        """Get the distance between two locations given by their distance matrix indices."""
+        return float(self.distance_matrix[idx_a, idx_b])
+    
+    def optimize_route(self, missions: List[CargoMission], start_location: str,
+                       include_cargo_types: bool = False) -> Dict[str, Any]:
         """
         Optimize the route for a set of cargo missions.
         
@@ -146,32 +251,27 @@ class RouteOptimizer:
         - route: list of locations to visit
         - mission_order: the order in which missions are completed
         - cargo_at_each_step: the cargo load at each step
-        - cargo_types_at_steps: the cargo types at each step
+        - cargo_types_at_steps: the cargo types at each step (only if include_cargo_types is set)
         - total_distance: the total distance traveled
         - total_payout: the total payout from all completed missions
         """
         if not missions:
             return {"error": "No missions provided"}
         
-        if not self.locations or not self.distance_matrix:
+        if not self.locations or self.distance_matrix is None:
             return {"error": "Location data not loaded"}
         
-        # Create a graph of all locations
-        G = nx.DiGraph()
+        # A mission without dropoffs could never be completed
+        missions_without_dropoffs = [str(mission.mission_id) for mission in missions if not mission.dropoffs]
+        if missions_without_dropoffs:
+            return {"error": f"Missions without dropoff locations: {', '.join(missions_without_dropoffs)}"}
         
         # Validate all locations exist in our data
-        all_locations = set([start_location])
-        invalid_locations = []
-        
-        for mission in missions:
-            all_locations.add(mission.pickup)
-            for dropoff in mission.dropoffs:
-                all_locations.add(dropoff)
+        all_locations = {start_location, *(mission.pickup for mission in missions),
+                         *(dropoff for mission in missions for dropoff in mission.dropoffs)}
         
         # Check all locations are valid
-        for loc in all_locations:
-            if loc not in self.location_indices:
-                invalid_locations.append(loc)
+        invalid_locations = list(all_locations - self.location_indices.keys())
         
         if invalid_locations:
             return {
@@ -179,291 +279,476 @@ class RouteOptimizer:
                 "valid_locations": list(self.location_indices.keys())
             }
         
-        # Add all unique locations
-        for loc in all_locations:
-            G.add_node(loc)
-        
-        # Add edges with distances
-        for loc_a in all_locations:
-            for loc_b in all_locations:
-                if loc_a != loc_b:
-                    distance = self.get_distance(loc_a, loc_b)
-                    G.add_edge(loc_a, loc_b, weight=distance)
-        
         # Now we'll use an improved algorithm that considers the overall journey efficiency
         # rather than just local optimizations
         
-        current_location = start_location
+        current_idx = self.location_indices[start_location]
         current_cargo = 0
-        route = [current_location]
-        mission_order = []
-        cargo_at_steps = [0]
-        total_distance = 0
-        total_payout = 0.0
-        cargo_types_at_steps = [{}]
+        # The stops in visiting order, as (ACTION_PICKUP, mission, None) or (ACTION_DROPOFF, mission, dropoff number)
+        events = []
+        
+        # Flat per-mission arrays for the loop below, with every location resolved to its
+        # distance matrix index once; missions are referred to by position
+        arrays = _MissionArrays(missions, self.location_indices)
+        next_dropoff = arrays.next_dropoff
+        
+        # Calculate the profit per distance ratio for each mission to use in scoring,
+        # summing each mission's pickup to dropoff distances in one pass over the flat arrays
+        pickup_to_dropoffs = self.distance_matrix[
+            np.repeat(arrays.pickup_idx, arrays.dropoff_count), arrays.dropoff_idx
+        ].astype(np.float64)
+        pickup_to_dropoffs_distance = np.add.reduceat(pickup_to_dropoffs, arrays.dropoff_start)
+        # reduceat gives an empty segment the next element instead of 0 (missions are checked
+        # to have dropoffs above, but keep the sums right regardless)
+        pickup_to_dropoffs_distance[arrays.dropoff_count == 0] = 0
         
-        # Make a copy of missions to track which ones are pending
-        pending_missions = missions.copy()
+        # Avoid division by zero
+        pickup_to_dropoffs_distance[pickup_to_dropoffs_distance == 0] = 1
+        
+        # Calculate efficiency as payout per distance unit. Missions sharing an id
+        # all use the efficiency of the last one, as they always have.
+        efficiency = np.array([mission.payout for mission in missions], dtype=np.float64) / pickup_to_dropoffs_distance
+        last_with_id = {mission.mission_id: m for m, mission in enumerate(missions)}
+        arrays.efficiency = efficiency[[last_with_id[mission.mission_id] for mission in missions]]
+        
+        # Missions still to be picked up, in their original order. Dicts are used as
+        # insertion-ordered sets: removal is O(1) and iteration order (which decides ties) is kept.
+        pending_missions = dict.fromkeys(range(len(missions)))
         completed_missions = []
         
-        # Keep track of missions that have been picked up but not dropped off
-        in_progress_missions = []
+        # Keep track of missions that have been picked up but not dropped off,
+        # mapped to the order they were picked up in
+        in_progress_missions = {}
         
-        # Calculate the profit per distance ratio for each mission to use in scoring
-        mission_efficiency = {}
-        for mission in missions:
-            pickup_to_dropoffs_distance = 0
-            for dropoff in mission.dropoffs:
-                pickup_to_dropoffs_distance += self.get_distance(mission.pickup, dropoff)
-            
-            # Avoid division by zero
-            if pickup_to_dropoffs_distance == 0:
-                pickup_to_dropoffs_distance = 1
-                
-            # Calculate efficiency as payout per distance unit
-            efficiency = mission.payout / pickup_to_dropoffs_distance if pickup_to_dropoffs_distance > 0 else 0
-            mission_efficiency[mission.mission_id] = efficiency
+        # Missions bucketed by location index: pending missions by pickup (in their original
+        # order) and in-progress missions by next dropoff, so the local checks don't scan every mission
+        pickups_at = {}
+        for m in pending_missions:
+            pickups_at.setdefault(int(arrays.pickup_idx[m]), {})[m] = None
+        dropoffs_at = {}
         
-        # Continue until all missions are completed
+        # Greedily pick the stops until all missions are completed
         while pending_missions or in_progress_missions:
             # Check for dropoffs at current location (always prioritize dropoffs)
-            local_dropoffs = [mission for mission in in_progress_missions 
-                            if mission.get_next_dropoff() == current_location]
+            local_dropoffs = dropoffs_at.get(current_idx)
             
             # Check for pickups at current location
-            local_pickups = [mission for mission in pending_missions 
-                           if mission.pickup == current_location and 
-                           current_cargo + mission.cargo_scu <= self.ship_capacity]
+            local_pickup = next((m for m in pickups_at.get(current_idx, ())
+                                 if current_cargo + arrays.cargo_scu[m] <= self.ship_capacity), None)
             
-            # Process dropoffs first to free up cargo space
+            # Process dropoffs first to free up cargo space, then pickups;
+            # otherwise travel to the best scoring next location
             if local_dropoffs:
-                mission = local_dropoffs[0]
-                current_cargo_type = mission.get_current_cargo_type()
-                cargo_for_dropoff = mission.get_current_cargo_amount()
-                current_cargo -= cargo_for_dropoff
-                
-                # Update cargo types
-                current_cargo_types = cargo_types_at_steps[-1].copy()
-                if current_cargo_type in current_cargo_types:
-                    current_cargo_types[current_cargo_type] = max(0, current_cargo_types[current_cargo_type] - cargo_for_dropoff)
-                    if current_cargo_types[current_cargo_type] == 0:
-                        del current_cargo_types[current_cargo_type]
-                        
-                cargo_types_at_steps.append(current_cargo_types)
-                mission_order.append(f"Dropoff {mission.mission_id} at {current_location} - {current_cargo_type}")
-                cargo_at_steps.append(current_cargo)
+                # The earliest picked up mission goes first
+                action, m = ACTION_DROPOFF, min(local_dropoffs, key=in_progress_missions.get)
+            elif local_pickup is not None:
+                action, m = ACTION_PICKUP, local_pickup
+            else:
+                pending = np.fromiter(pending_missions, dtype=np.intp, count=len(pending_missions))
+                carried = np.fromiter(in_progress_missions, dtype=np.intp, count=len(in_progress_missions))
+                pickup_scores, dropoff_scores = self._score_options(
+                    current_idx, arrays, pending, carried, current_cargo
+                )
+                scores = np.concatenate((pickup_scores, dropoff_scores))
                 
-                # Update mission status
-                has_more_dropoffs = mission.advance_dropoff()
-                if not has_more_dropoffs:
-                    in_progress_missions.remove(mission)
-                    completed_missions.append(mission)
-                    total_payout += mission.payout
+                # The first highest-scoring option wins: pickups in pending order, then dropoffs
+                best = int(np.argmax(scores)) if scores.size else None
                 
-                continue  # Process another dropoff if available
-            
-            # Process pickups after all dropoffs are done
-            if local_pickups:
-                mission = local_pickups[0]
-                pending_missions.remove(mission)
-                in_progress_missions.append(mission)
-                current_cargo += mission.cargo_scu
+                # If no valid option, it means we can't complete all missions with the given capacity
+                if best is None or scores[best] == float('-inf'):
+                    return {
+                        "error": "Cannot complete all missions with the given ship capacity",
+                        "route_so_far": self._build_result(missions, arrays, start_location, events)["route"],
+                        "completed_missions": [missions[m].mission_id for m in completed_missions],
+                        "remaining_missions": [missions[m].mission_id for m in [*pending_missions, *in_progress_missions]]
+                    }
                 
-                # Update cargo types
-                current_cargo_types = cargo_types_at_steps[-1].copy()
-                if mission.cargo_type in current_cargo_types:
-                    current_cargo_types[mission.cargo_type] += mission.cargo_scu
+                if best < len(pending):
+                    action, m = ACTION_PICKUP, int(pending[best])
                 else:
-                    current_cargo_types[mission.cargo_type] = mission.cargo_scu
-                    
-                cargo_types_at_steps.append(current_cargo_types)
-                mission_order.append(f"Pickup {mission.mission_id} - {mission.cargo_type}")
-                cargo_at_steps.append(current_cargo)
-                
-                continue  # Process another pickup if available
-            
-            # If no local operations, find the next best location to visit
-            # This now uses a more comprehensive scoring system
-            
-            best_option = None
-            best_score = float('-inf')
+                    action, m = ACTION_DROPOFF, int(carried[best - len(pending)])
             
-            # Score both pickups and dropoffs based on multiple factors
-            for mission in pending_missions:
-                if current_cargo + mission.cargo_scu <= self.ship_capacity:
-                    score = self._calculate_option_score(
-                        current_location,
-                        mission.pickup,
-                        "pickup",
-                        mission,
-                        mission_efficiency.get(mission.mission_id, 0),
-                        current_cargo,
-                        self.ship_capacity,
-                        in_progress_missions
-                    )
-                    
-                    if score > best_score:
-                        best_score = score
-                        best_option = ("pickup", mission)
-            
-            for mission in in_progress_missions:
-                next_dropoff = mission.get_next_dropoff()
-                if next_dropoff:
-                    score = self._calculate_option_score(
-                        current_location,
-                        next_dropoff,
-                        "dropoff",
-                        mission,
-                        mission_efficiency.get(mission.mission_id, 0),
-                        current_cargo,
-                        self.ship_capacity,
-                        in_progress_missions
-                    )
-                    
-                    if score > best_score:
-                        best_score = score
-                        best_option = ("dropoff", mission)
-            
-            # If no valid option, it means we can't complete all missions with the given capacity
-            if best_option is None:
-                return {
-                    "error": "Cannot complete all missions with the given ship capacity",
-                    "route_so_far": route,
-                    "completed_missions": completed_missions,
-                    "remaining_missions": pending_missions + in_progress_missions
-                }
-            
-            # Execute the best option
-            action, mission = best_option
-            if action == "pickup":
-                pending_missions.remove(mission)
-                in_progress_missions.append(mission)
+            if action == ACTION_PICKUP:
+                del pending_missions[m]
+                in_progress_missions[m] = len(events)
+                events.append((ACTION_PICKUP, m, None))
+                current_idx = int(arrays.pickup_idx[m])
+                current_cargo += float(arrays.cargo_scu[m])
                 
-                # Calculate and add distance
-                distance = self.get_distance(current_location, mission.pickup)
-                total_distance += distance
+                del pickups_at[current_idx][m]
+                dropoffs_at.setdefault(int(arrays.dropoff_idx[arrays.dropoff_start[m]]), {})[m] = None
                 
-                # Update location and cargo
-                route.append(mission.pickup)
-                current_location = mission.pickup
-                current_cargo += mission.cargo_scu
+            else:  # dropoff
+                dropoff_number = int(next_dropoff[m])
+                dropoff_pos = arrays.dropoff_start[m] + dropoff_number
+                events.append((ACTION_DROPOFF, m, dropoff_number))
+                current_idx = int(arrays.dropoff_idx[dropoff_pos])
+                current_cargo -= float(arrays.dropoff_amount[dropoff_pos])
                 
-                # Update tracking data
-                current_cargo_types = cargo_types_at_steps[-1].copy()
-                if mission.cargo_type in current_cargo_types:
-                    current_cargo_types[mission.cargo_type] += mission.cargo_scu
+                # Update mission status
+                del dropoffs_at[current_idx][m]
+                next_dropoff[m] += 1
+                if next_dropoff[m] == arrays.dropoff_count[m]:
+                    del in_progress_missions[m]
+                    completed_missions.append(m)
                 else:
-                    current_cargo_types[mission.cargo_type] = mission.cargo_scu
-                    
-                cargo_types_at_steps.append(current_cargo_types)
-                mission_order.append(f"Pickup {mission.mission_id} - {mission.cargo_type}")
-                cargo_at_steps.append(current_cargo)
+                    dropoffs_at.setdefault(int(arrays.dropoff_idx[dropoff_pos + 1]), {})[m] = None
+        
+        # Find the shortest order outright for small sets of missions, otherwise
+        # polish the greedy order; then work out the route and cargo along it
+        start_idx = self.location_indices[start_location]
+        exact_events = None
+        if math.prod(int(count) + 2 for count in arrays.dropoff_count) <= EXACT_SEARCH_MAX_STATES:
+            exact_events = self._exact_route(start_idx, arrays)
+        events = exact_events or self._two_opt(events, start_idx, arrays)
+        return self._build_result(missions, arrays, start_location, events, include_cargo_types)
+    
+    def _build_result(self, missions, arrays, start_location, events, include_cargo_types=False) -> Dict[str, Any]:
+        """Replay a sequence of stops from the start location into the optimize_route result."""
+        current_idx = self.location_indices[start_location]
+        current_cargo = 0.0
+        total_distance = 0
+        total_payout = 0.0
+        completed_missions = []
+        
+        # There is at most one move and exactly one cargo change per stop, so the visited
+        # locations and cargo loads go into preallocated arrays; names are looked up at the end
+        route_idx = np.empty(len(events) + 1, dtype=np.intp)
+        route_idx[0] = current_idx
+        route_length = 1
+        cargo_at_steps = np.empty(len(events) + 1, dtype=np.float64)
+        cargo_at_steps[0] = current_cargo
+        
+        for step, (action, m, dropoff_number) in enumerate(events, 1):
+            mission = missions[m]
+            if action == ACTION_PICKUP:
+                # Travel to the pickup if we're not already there
+                pickup_idx = arrays.pickup_idx[m]
+                if pickup_idx != current_idx:
+                    total_distance += self._dist_by_idx(current_idx, pickup_idx)
+                    route_idx[route_length] = current_idx = pickup_idx
+                    route_length += 1
                 
-            else:  # dropoff
-                dropoff_location = mission.get_next_dropoff()
+                cargo_scu = float(arrays.cargo_scu[m])
+                current_cargo += cargo_scu
                 
-                # Calculate and add distance
-                distance = self.get_distance(current_location, dropoff_location)
-                total_distance += distance
+            else:  # dropoff
+                dropoff_pos = arrays.dropoff_start[m] + dropoff_number
                 
-                # Update location and cargo
-                route.append(dropoff_location)
-                current_location = dropoff_location
+                # Travel to the dropoff if we're not already there
+                dropoff_idx = arrays.dropoff_idx[dropoff_pos]
+                if dropoff_idx != current_idx:
+                    total_distance += self._dist_by_idx(current_idx, dropoff_idx)
+                    route_idx[route_length] = current_idx = dropoff_idx
+                    route_length += 1
                 
                 # Process the dropoff
-                current_cargo_type = mission.get_current_cargo_type()
-                cargo_for_dropoff = mission.get_current_cargo_amount()
-                current_cargo -= cargo_for_dropoff
-                
-                # Update tracking data
-                current_cargo_types = cargo_types_at_steps[-1].copy()
-                if current_cargo_type in current_cargo_types:
-                    current_cargo_types[current_cargo_type] = max(0, current_cargo_types[current_cargo_type] - cargo_for_dropoff)
-                    if current_cargo_types[current_cargo_type] == 0:
-                        del current_cargo_types[current_cargo_type]
-                        
-                cargo_types_at_steps.append(current_cargo_types)
-                mission_order.append(f"Dropoff {mission.mission_id} at {dropoff_location} - {current_cargo_type}")
-                cargo_at_steps.append(current_cargo)
+                current_cargo -= float(arrays.dropoff_amount[dropoff_pos])
                 
-                # Update mission status
-                has_more_dropoffs = mission.advance_dropoff()
-                if not has_more_dropoffs:
-                    in_progress_missions.remove(mission)
-                    completed_missions.append(mission)
+                # The mission is complete after its last dropoff
+                if dropoff_number == arrays.dropoff_count[m] - 1:
+                    completed_missions.append(m)
                     total_payout += mission.payout
+            
+            cargo_at_steps[step] = current_cargo
         
-        return {
-            "route": route,
-            "mission_order": mission_order,
-            "cargo_at_each_step": cargo_at_steps,
-            "cargo_types_at_steps": cargo_types_at_steps,
+        location_names = self.location_names
+        result = {
+            "route": [location_names[idx] for idx in route_idx[:route_length]],
+            "mission_order": [_describe_stop(missions[m], action, dropoff_number)
+                              for action, m, dropoff_number in events],
+            "cargo_at_each_step": cargo_at_steps.tolist(),
             "total_distance": total_distance,
             "total_payout": total_payout,
-            "completed_missions": [m.mission_id for m in completed_missions]
+            "completed_missions": [missions[m].mission_id for m in completed_missions]
         }
+        if include_cargo_types:
+            result["cargo_types_at_steps"] = _cargo_types_at_steps(missions, arrays, events)
+        return result
     
-    def _calculate_option_score(self, current_location, target_location, action_type, mission, 
-                                efficiency, current_cargo, max_cargo, in_progress_missions):
+    def _exact_route(self, start_idx, arrays):
         """
-        Calculate a comprehensive score for a potential next action.
-        Higher scores are better options.
+        Find the shortest order of stops from start_idx by dynamic programming over mission progress.
+        
+        A state is how far each mission has got (not picked up, picked up, some dropoffs done)
+        plus the current location; only the shortest way to reach each state is kept. Pickups that
+        would overload the ship are not allowed. The number of states grows exponentially with the
+        number of missions, so this is only used for small sets. Returns the stops as in
+        optimize_route, or None if no order completes every mission.
         """
-        # Get the base distance score (negative because shorter is better)
-        distance = self.get_distance(current_location, target_location)
-        distance_score = -distance if distance > 0 else 0
+        mission_count = len(arrays.pickup_idx)
+        dropoffs = [slice(start, start + count) for start, count in zip(arrays.dropoff_start, arrays.dropoff_count)]
+        
+        # Each mission's stops in order, as changes in cargo and as locations numbered
+        # within the few locations involved, so distances come from a small nested list
+        stop_cargo = [[float(arrays.cargo_scu[m]), *(-arrays.dropoff_amount[dropoffs[m]]).tolist()]
+                      for m in range(mission_count)]
+        stop_indices = [start_idx]
+        for m in range(mission_count):
+            stop_indices.append(arrays.pickup_idx[m])
+            stop_indices.extend(arrays.dropoff_idx[dropoffs[m]])
+        used, local_indices = np.unique(stop_indices, return_inverse=True)
+        local_indices = local_indices.tolist()
+        distances = self.distance_matrix[np.ix_(used, used)].tolist()
+        
+        stop_locations = []
+        cursor = 1
+        for m in range(mission_count):
+            stop_count = len(stop_cargo[m])
+            stop_locations.append(local_indices[cursor:cursor + stop_count])
+            cursor += stop_count
+        stop_counts = [len(stops) for stops in stop_locations]
+        max_cargo = self.ship_capacity + 1e-9
+        
+        # states maps (progress, location) to (distance, cargo); parents[step] maps each
+        # state reached after that many stops to the state it came from and the stop taken
+        states = {((0,) * mission_count, local_indices[0]): (0.0, 0.0)}
+        parents = []
+        for _ in range(sum(stop_counts)):
+            next_states = {}
+            step_parents = {}
+            for state, (distance, cargo) in states.items():
+                progress, location = state
+                row = distances[location]
+                for m in range(mission_count):
+                    stop = progress[m]
+                    if stop == stop_counts[m]:
+                        continue
+                    next_cargo = cargo + stop_cargo[m][stop]
+                    if stop == 0 and next_cargo > max_cargo:
+                        continue
+                    next_location = stop_locations[m][stop]
+                    next_state = (progress[:m] + (stop + 1,) + progress[m + 1:], next_location)
+                    next_distance = distance + row[next_location]
+                    best = next_states.get(next_state)
+                    if best is None or next_distance < best[0]:
+                        next_states[next_state] = (next_distance, next_cargo)
+                        step_parents[next_state] = (state, m, stop)
+            if not next_states:
+                return None
+            states = next_states
+            parents.append(step_parents)
         
-        # Efficiency score (payout per distance)
-        efficiency_score = efficiency * 10000  # Scale factor to make this comparable
+        # Walk back from the shortest finished state
+        state = min(states, key=lambda state: states[state][0])
+        events = []
+        for step_parents in reversed(parents):
+            state, m, stop = step_parents[state]
+            events.append((ACTION_PICKUP, m, None) if stop == 0 else (ACTION_DROPOFF, m, stop - 1))
+        events.reverse()
+        return events
+    
+    def _two_opt(self, events, start_idx, arrays):
+        """
+        Improve a sequence of stops with 2-opt: reverse a run of stops wherever that shortens the
+        route, until no reversal helps. The route starts at start_idx and ends at the last stop.
+        
+        A reversal is only allowed if the run holds at most one stop per mission (so every pickup
+        stays before its dropoffs, and dropoffs stay in order) and the cargo never exceeds the
+        ship's capacity along the new order. Returns the improved list of stops.
+        """
+        n = len(events)
+        if n < 3:
+            return events
+        
+        # Per stop: distance matrix index, mission and change in cargo
+        stop_idx = np.empty(n, dtype=np.intp)
+        stop_mission = np.empty(n, dtype=np.intp)
+        stop_cargo = np.empty(n, dtype=np.float64)
+        for e, (action, m, dropoff_number) in enumerate(events):
+            stop_mission[e] = m
+            if action == ACTION_PICKUP:
+                stop_idx[e] = arrays.pickup_idx[m]
+                stop_cargo[e] = arrays.cargo_scu[m]
+            else:
+                dropoff_pos = arrays.dropoff_start[m] + dropoff_number
+                stop_idx[e] = arrays.dropoff_idx[dropoff_pos]
+                stop_cargo[e] = -arrays.dropoff_amount[dropoff_pos]
+        
+        # Distances with an extra zero-distance "end of route" location after the last stop
+        end = len(self.distance_matrix)
+        distances = np.zeros((end + 1, end + 1))
+        distances[:end, :end] = self.distance_matrix
+        max_cargo = self.ship_capacity + 1e-9
+        order = np.arange(n)
+        
+        def layout():
+            """Locations, leg distances, cargo on board and furthest reversible run ends for the current order."""
+            locations = np.concatenate(([start_idx], stop_idx[order], [end]))
+            legs = distances[locations[:-1], locations[1:]]
+            # Cargo on board after each stop, with the empty hold at the start in front
+            cargo = np.concatenate(([0.0], np.cumsum(stop_cargo[order])))
+            
+            # A run starting at a stop can extend until just before
+            # the first stop after it that repeats a mission within the run
+            missions_in_order = stop_mission[order]
+            by_mission = np.argsort(missions_in_order, kind='stable')
+            same = missions_in_order[by_mission[1:]] == missions_in_order[by_mission[:-1]]
+            next_same = np.full(n, n, dtype=np.intp)
+            next_same[by_mission[:-1][same]] = by_mission[1:][same]
+            run_end = np.minimum.accumulate(next_same[::-1])[::-1] - 1
+            return locations, legs, cargo, run_end
+        
+        locations, legs, cargo, run_end = layout()
+        improved = True
+        while improved:
+            improved = False
+            for i in range(n - 1):
+                last = run_end[i]
+                if last <= i:
+                    continue
+                
+                # Reversing stops i..j for each candidate j = i + 1 .. last: the path comes from the
+                # location before stop i into stop j, and leaves from stop i to the location after
+                # stop j. locations and legs are offset by one because the start location is in front.
+                ends, afters = locations[i + 2:last + 2], locations[i + 3:last + 3]
+                delta = (
+                    distances[locations[i], ends] + distances[locations[i + 1], afters]
+                    - legs[i] - legs[i + 2:last + 2]
+                )
+                
+                # Cargo peaks in the reversed run right after the reversed stop with the
+                # least cargo before it: cargo[i] + cargo[j + 1] - min(cargo[i..j])
+                lowest = np.minimum.accumulate(cargo[i:last + 1])[1:]
+                delta[cargo[i] + cargo[i + 2:last + 2] - lowest > max_cargo] = np.inf
+                
+                best = int(np.argmin(delta))
+                if delta[best] < -1e-6:
+                    j = i + 1 + best
+                    order[i:j + 1] = order[i:j + 1][::-1].copy()
+                    locations, legs, cargo, run_end = layout()
+                    improved = True
+        
+        return [events[e] for e in order]
+    
+    def _score_options(self, current_idx, arrays, pending, carried, current_cargo):
+        """
+        Score every possible next action at once: picking up each pending mission and
+        going to the next dropoff of each in-progress (carried) mission. Higher scores are better options.
+        
+        pending and carried are arrays of mission positions. Returns (pickup_scores, dropoff_scores)
+        arrays in the same order. Pickups that would overload the ship score -inf.
+        """
+        max_cargo = self.ship_capacity
+        distances = self.distance_matrix[current_idx].astype(np.float64)
+        
+        pickup_idx = arrays.pickup_idx[pending]
+        
+        dropoff_pos = arrays.dropoff_start[carried] + arrays.next_dropoff[carried]
+        dropoff_idx = arrays.dropoff_idx[dropoff_pos]
+        
+        carried_pickup_idx = arrays.pickup_idx[carried]
+        
+        # Which locations have a carried mission's next dropoff / pickup, for the look-ahead bonuses
+        dropoff_here = np.zeros(len(distances), dtype=bool)
+        dropoff_here[dropoff_idx] = True
+        pickup_here = np.zeros(len(distances), dtype=bool)
+        pickup_here[carried_pickup_idx] = True
         
         # Cargo utilization factors
         cargo_utilization = current_cargo / max_cargo if max_cargo > 0 else 0
         
-        # Different scoring strategies for pickups vs dropoffs
-        if action_type == "pickup":
-            # Prioritize pickups when we have low cargo utilization
-            # But avoid pickups when we're near capacity
-            cargo_factor = 1 - cargo_utilization  # Higher score when cargo is low
-            
-            # Look ahead - consider if we have a dropoff at this pickup location
-            # This encourages dropping off cargo before picking up new cargo at the same location
-            has_dropoff_here = any(m.get_next_dropoff() == target_location for m in in_progress_missions)
-            dropoff_bonus = 5000 if has_dropoff_here else 0
-            
-            # Discourage pickups when we're nearly full
-            capacity_factor = 0 if current_cargo + mission.cargo_scu > max_cargo else 1
-            
-            return distance_score + efficiency_score + (cargo_factor * 2000) + dropoff_bonus + (capacity_factor * 3000)
-            
-        else:  # dropoff
-            # Prioritize dropoffs when we have high cargo utilization
-            cargo_factor = cargo_utilization  # Higher score when cargo is high
-            
-            # Add an urgency factor - prioritize dropoffs that are filling up our cargo hold
-            cargo_amount = mission.get_current_cargo_amount()
-            cargo_urgency = cargo_amount / max_cargo if max_cargo > 0 else 0
-            
-            # Look ahead - consider if we have a pickup at this dropoff location
-            # This encourages efficient operations at the same location
-            has_pickup_here = any(m.pickup == target_location for m in in_progress_missions)
-            pickup_bonus = 3000 if has_pickup_here else 0
-            
-            return distance_score + efficiency_score + (cargo_factor * 3000) + (cargo_urgency * 4000) + pickup_bonus
+        # Pickups:
+        # - distance score (negative because shorter is better)
+        # - efficiency score (payout per distance, scaled to be comparable)
+        # - prioritize pickups when we have low cargo utilization
+        # - look ahead: bonus if we also have a dropoff at this pickup location
+        # - pickups that don't fit are not an option at all
+        pickup_scores = (
+            -distances[pickup_idx]
+            + arrays.efficiency[pending] * 10000
+            + (1 - cargo_utilization) * 2000
+            + dropoff_here[pickup_idx] * 5000.0
+            + 3000
+        )
+        pickup_scores[current_cargo + arrays.cargo_scu[pending] > max_cargo] = float('-inf')
+        
+        # Dropoffs:
+        # - the same distance and efficiency scores
+        # - prioritize dropoffs when we have high cargo utilization
+        # - urgency: prioritize dropoffs that are filling up our cargo hold
+        # - look ahead: bonus if a carried mission's pickup is at this dropoff location
+        dropoff_cargo = arrays.dropoff_amount[dropoff_pos]
+        cargo_urgency = dropoff_cargo / max_cargo if max_cargo > 0 else np.zeros_like(dropoff_cargo)
+        dropoff_scores = (
+            -distances[dropoff_idx]
+            + arrays.efficiency[carried] * 10000
+            + cargo_utilization * 3000
+            + cargo_urgency * 4000
+            + pickup_here[dropoff_idx] * 3000.0
+        )
+        
+        return pickup_scores, dropoff_scores
+
 
+@lru_cache(maxsize=8)
+def _get_optimizer(ship_capacity: float) -> RouteOptimizer:
+    """Get a shared RouteOptimizer for a ship capacity. Optimizers keep no per-route state."""
+    return RouteOptimizer(ship_capacity=ship_capacity)
 
-def calculate_route(missions: List[Dict[str, Any]], start_location: str, ship_capacity: float = DEFAULT_SHIP_CAPACITY) -> Dict[str, Any]:
+
+def calculate_route(missions: List[Dict[str, Any]], start_location: str, ship_capacity: float = DEFAULT_SHIP_CAPACITY,
+                    include_cargo_types: bool = False) -> Dict[str, Any]:
     """
     Calculate the optimal route for the given missions.
     
+    Route calculation is deterministic, so results are cached per process: identical
+    requests (re-submits, switching back to a previous ship) are answered from the cache.
+    Each call gets its own copy of the result.
+    
     Args:
         missions: List of mission dictionaries with pickup, dropoffs, cargo_scu, cargo_type and optional payout
         start_location: The starting location
         ship_capacity: The cargo capacity of the ship (default: Constellation Taurus)
+        include_cargo_types: Also return the cargo carried per type at each step (cargo_types_at_steps)
         
     Returns:
         Dict with optimized route information
     """
-    optimizer = RouteOptimizer(ship_capacity=ship_capacity)
+    args = (missions, start_location, ship_capacity, include_cargo_types)
+    try:
+        _load_location_files()
+        # Sorted keys give equivalent requests the same cache key. The standard library encoder
+        # is used because it keeps inf and nan distinct, where orjson writes both as null.
+        request = _RouteRequest(json.dumps(args, sort_keys=True), args)
+    except (FileNotFoundError, TypeError, ValueError):
+        # Don't cache results computed without location data, or requests that can't be serialized
+        return _calculate_route(*args)
+    return copy.deepcopy(_calculate_route_cached(request))
+
+
+class _RouteRequest:
+    """
+    A calculate_route call as a result cache key: hashed and compared by its serialized
+    arguments, but solved from the arguments themselves so no value is changed by serializing.
+    """
+    
+    __slots__ = ('key', 'args')
+    
+    def __init__(self, key: str, args: Tuple[Any, ...]):
+        self.key = key
+        self.args = args
+    
+    def __hash__(self):
+        return hash(self.key)
+    
+    def __eq__(self, other):
+        return isinstance(other, _RouteRequest) and self.key == other.key
+
+
+@lru_cache(maxsize=1024)
+def _calculate_route_cached(request: _RouteRequest) -> Dict[str, Any]:
+    """Calculate a route for a calculate_route request, cached by its serialized arguments."""
+    return _calculate_route(*request.args)
+
+
+def _calculate_route(missions: List[Dict[str, Any]], start_location: str, ship_capacity: float,
+                     include_cargo_types: bool) -> Dict[str, Any]:
+    """Calculate the route for the given missions without caching (see calculate_route)."""
+    optimizer = _get_optimizer(ship_capacity)
+    if optimizer.distance_matrix is None:
+        # Location data wasn't available; don't keep the empty optimizer around so the next call retries
+        _get_optimizer.cache_clear()
     
     # Convert mission dictionaries to CargoMission objects
     cargo_missions = []
@@ -522,7 +807,7 @@ def calculate_route(missions: List[Dict[str, Any]], start_location: str, ship_ca
             )
         )
     
-    return optimizer.optimize_route(cargo_missions, start_location)
+    return optimizer.optimize_route(cargo_missions, start_location, include_cargo_types)
 
 
 if __name__ == "__main__":
@@ -555,4 +840,4 @@ if __name__ == "__main__":
         }
     ]
     result = calculate_route(test_missions, "Port Olisar")
-    print(json.dumps(result, indent=2)) 
\ No newline at end of file
+    print(json.dumps(result, indent=2))
\ No newline at end of file
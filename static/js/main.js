@@ -198,8 +198,8 @@ function loadLocationData() {
     // Clear any cached locations
     locations = [];
     
-    // Add cache-busting parameter to force reload
-    fetch('/api/locations?t=' + new Date().getTime())
+    // The server sends an ETag, so the browser revalidates instead of re-downloading
+    fetch('/api/locations')
         .then(response => {
             if (!response.ok) {
                 throw new Error(`HTTP error! Status: ${response.status}`);
@@ -207,20 +207,27 @@ function loadLocationData() {
             return response.json();
         })
         .then(data => {
-            if (!data || data.error) {
-                throw new Error(data.error || 'Invalid location data received');
+            if (!data || data.error || !Array.isArray(data.names)) {
+                throw new Error((data && data.error) || 'Invalid location data received');
             }
-            console.log(`Loaded ${data.length} locations from server`);
+            
+            // The server sends parallel columns; turn them back into one object per location
+            const serverLocations = data.names.map((name, i) => ({
+                name: name,
+                type: data.types[i],
+                coordinates: [data.x[i], data.z[i]]
+            }));
+            console.log(`Loaded ${serverLocations.length} locations from server`);
             
             // Debug logging
             console.log("DEBUG: Checking for specific locations in frontend data:");
-            const locationNames = data.map(loc => loc.name);
+            const locationNames = data.names;
             console.log("DEBUG: All locations:", locationNames);
             console.log("DEBUG: Has Riker Memorial Spaceport:", locationNames.includes("Riker Memorial Spaceport"));
             console.log("DEBUG: Has Samson & Son's Salvage Center:", locationNames.includes("Samson & Son's Salvage Center"));
             console.log("DEBUG: Has CRU-L4 Shallow Fields Station:", locationNames.includes("CRU-L4 Shallow Fields Station"));
             
-            locations = data;
+            locations = serverLocations;
             populateLocationSelects();
             addLocationsToMap();
             
@@ -0,0 +1,14 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    """The location data is read from paths relative to the repository root."""
+    monkeypatch.chdir(ROOT)
+    return ROOT
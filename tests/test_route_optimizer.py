@@ -0,0 +1,107 @@
+"""
+Checks of optimized routes for random missions: the cargo never exceeds the ship's capacity,
+every mission is picked up before its dropoffs and visits them in order, and small sets
+(routed exactly) get the shortest route found by trying every order.
+Larger sets go through the greedy search and 2-opt.
+"""
+import math
+import random
+
+import pytest
+
+from route_optimizer import _calculate_route, _get_optimizer, _load_location_files
+
+TRIALS = 50
+
+
+def shortest_route_distance(optimizer, missions, start_location):
+    """
+    Shortest total distance over every valid order of the missions' stops, by trying them all.
+    Only for a handful of missions with evenly split dropoff amounts.
+    """
+    stops = [[mission["pickup"], *mission["dropoffs"]] for mission in missions]
+    cargo_changes = [[mission["cargo_scu"]] + [-mission["cargo_scu"] / len(mission["dropoffs"])] * len(mission["dropoffs"])
+                     for mission in missions]
+
+    def shortest_from(progress, location, cargo):
+        if all(done == len(mission_stops) for done, mission_stops in zip(progress, stops)):
+            return 0
+        shortest = float('inf')
+        for m, done in enumerate(progress):
+            if done == len(stops[m]) or (done == 0 and cargo + cargo_changes[m][0] > optimizer.ship_capacity):
+                continue
+            next_progress = progress[:m] + (done + 1,) + progress[m + 1:]
+            shortest = min(shortest, optimizer.get_distance(location, stops[m][done])
+                           + shortest_from(next_progress, stops[m][done], cargo + cargo_changes[m][done]))
+        return shortest
+
+    return shortest_from((0,) * len(missions), start_location, 0)
+
+
+def random_instances(small, seed):
+    """Random (missions, start_location, ship_capacity) sets over a few nearby location names."""
+    rng = random.Random(seed)
+    location_names = _load_location_files()[1]
+    instances = []
+    for _ in range(TRIALS):
+        ship_capacity = rng.choice([46, 66, 168])
+        pool = rng.sample(location_names, 6)
+        missions = [
+            {
+                "id": f"M{i + 1}",
+                "pickup": rng.choice(pool),
+                "dropoffs": [rng.choice(pool) for _ in range(rng.randint(1, 2))],
+                "cargo_scu": rng.choice([10, 20, 40]),
+                "payout": rng.choice([0, 5000, 20000])
+            }
+            for i in range(rng.randint(1, 3) if small else rng.randint(7, 10))
+        ]
+        instances.append((missions, rng.choice(pool), ship_capacity))
+    return instances
+
+
+@pytest.fixture(params=[True, False], ids=["exact", "greedy"])
+def routed_instances(request):
+    """Random mission sets with their optimized routes, skipping sets the optimizer rejects."""
+    routed = []
+    for missions, start_location, ship_capacity in random_instances(request.param, seed=0 if request.param else 1):
+        result = _calculate_route(missions, start_location, ship_capacity, False)
+        if "error" not in result:
+            routed.append((missions, start_location, ship_capacity, result))
+    assert routed
+    return routed
+
+
+def test_cargo_stays_within_capacity(routed_instances):
+    for missions, start_location, ship_capacity, result in routed_instances:
+        assert max(result["cargo_at_each_step"]) <= ship_capacity + 1e-9, result["cargo_at_each_step"]
+
+
+def test_pickups_come_before_dropoffs_in_order(routed_instances):
+    for missions, start_location, ship_capacity, result in routed_instances:
+        progress = {mission["id"]: 0 for mission in missions}
+        dropoffs = {mission["id"]: mission["dropoffs"] for mission in missions}
+        for step in result["mission_order"]:
+            action, mission_id = step.split()[:2]
+            done = progress[mission_id]
+            if action == "Pickup":
+                assert done == 0, (mission_id, result["mission_order"])
+            else:
+                assert 0 < done <= len(dropoffs[mission_id]), (mission_id, result["mission_order"])
+                assert step.startswith(f"Dropoff {mission_id} at {dropoffs[mission_id][done - 1]} - "), step
+            progress[mission_id] = done + 1
+        assert all(progress[mission_id] == len(dropoffs[mission_id]) + 1 for mission_id in progress), progress
+
+
+@pytest.mark.parametrize("routed_instances", [True], ids=["exact"], indirect=True)
+def test_small_sets_get_the_shortest_route(routed_instances):
+    for missions, start_location, ship_capacity, result in routed_instances:
+        shortest = shortest_route_distance(_get_optimizer(ship_capacity), missions, start_location)
+        assert math.isclose(result["total_distance"], shortest, rel_tol=1e-9), (result["total_distance"], shortest)
+
+
+def test_mission_without_dropoffs_is_rejected():
+    location_names = _load_location_files()[1]
+    missions = [{"id": "M1", "pickup": location_names[0], "dropoffs": [], "cargo_scu": 10}]
+    result = _calculate_route(missions, location_names[1], 46, False)
+    assert result == {"error": "Missions without dropoff locations: M1"}